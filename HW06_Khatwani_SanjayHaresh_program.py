@@ -142,20 +142,143 @@ def merge_clusters_and_recalculate_center(pair, clusters, data, centers):
 def agglomerative_clustering(data, clusters, centers):
     """
     This method performs hierarchical clustering on data.
+    Every merge is also recorded in a linkage list so that the hierarchy can
+    later be cut at any number of clusters without re-clustering. Each row of
+    the linkage is [node 1, node 2, distance, size of merged cluster], where
+    nodes 0 to n-1 are the data points and the cluster created by the i-th
+    merge is node n+i.
     :param data: data
     :param clusters: initial clusters where every point is its own cluster
     :param centers: same as data points initially.
-    :return: clusters and their centers.
+    :return: clusters, their centers, sizes of smaller clusters and linkage.
     """
     sizes = []
+    linkage_rows = []
+    n = len(data)
+    if len(centers) != n or sorted(clusters) != list(range(n)):
+        raise ValueError("Every point must start in its own cluster, "
+                         "numbered 0 to %d" % (n - 1))
+    # Leaf nodes are row positions in data, not cluster indices
+    node_ids = [0] * n
+    for i in range(n):
+        node_ids[clusters[i]] = i
+    node_sizes = [1] * n
     while len(set(clusters)) > 1:
         closest_clusters, distance = get_closest_clusters(centers)
 
         clusters, centers, size_of_smaller_cluster = merge_clusters_and_recalculate_center(
             closest_clusters, clusters, data, centers)
 
+        keep, drop = min(closest_clusters), max(closest_clusters)
+        merged_size = node_sizes[keep] + node_sizes[drop]
+        linkage_rows.append([node_ids[keep], node_ids[drop], distance,
+                             merged_size])
+        node_ids[keep] = n + len(linkage_rows) - 1
+        node_sizes[keep] = merged_size
+        node_sizes[drop] = 0
+
         sizes.append(size_of_smaller_cluster)
-    return [clusters, centers, sizes]
+    return [clusters, centers, sizes, linkage_rows]
+
+
+def write_linkage(filename, linkage_rows):
+    """
+    This method writes the merge history of a clustering run to a csv file
+    so the hierarchy can be explored later without re-clustering.
+    :param filename: name of csv file
+    :param linkage_rows: linkage returned by agglomerative_clustering
+    :return: N/A.
+    """
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, delimiter=',', quotechar='|')
+        writer.writerow(['Node1', 'Node2', 'Distance', 'Size'])
+        for row in linkage_rows:
+            writer.writerow(row)
+
+
+def read_linkage(filename):
+    """
+    This method reads a merge history written by write_linkage.
+    :param filename: name of csv file
+    :return: linkage rows
+    """
+    linkage_rows = []
+    with open(filename, 'r') as csvfile:
+        reader = csv.reader(csvfile, delimiter=',', quotechar='|')
+        next(reader)
+        for row in reader:
+            linkage_rows.append([int(row[0]), int(row[1]), float(row[2]),
+                                 int(row[3])])
+    return linkage_rows
+
+
+def find_root(parents, node):
+    """
+    This method finds the top-most merged cluster a node belongs to, and
+    compresses the path on the way so later lookups are cheap.
+    :param parents: parent node of every node
+    :param node: node to look up
+    :return: root node
+    """
+    root = node
+    while parents[root] != root:
+        root = parents[root]
+    while parents[node] != root:
+        parents[node], node = root, parents[node]
+    return root
+
+
+def cut_hierarchy(data, linkage_rows, k=None, threshold=None):
+    """
+    This method cuts a recorded hierarchy either at k clusters or at a
+    distance threshold, and returns the resulting clusters. Merges are
+    replayed in the order they happened, so a threshold cut stops at the
+    first merge whose distance is above the threshold.
+    :param data: data points the linkage was built from
+    :param linkage_rows: linkage returned by agglomerative_clustering
+    :param k: number of clusters wanted
+    :param threshold: largest merge distance to keep
+    :return: cluster label of every point, centers and sizes of the clusters
+    """
+    n = len(data)
+    if (k is None) == (threshold is None):
+        raise ValueError("Exactly one of k and threshold must be given")
+    if k is not None:
+        if not isinstance(k, int) or k < 1 or k > n:
+            raise ValueError("k must be an integer between 1 and %d" % n)
+        merges = n - k
+        if merges > len(linkage_rows):
+            raise ValueError("Linkage has %d merges but %d are needed for "
+                             "k = %d" % (len(linkage_rows), merges, k))
+    else:
+        merges = 0
+        while merges < len(linkage_rows) and \
+                linkage_rows[merges][2] <= threshold:
+            merges += 1
+
+    parents = list(range(n + merges))
+    for i in range(merges):
+        node1, node2 = linkage_rows[i][0], linkage_rows[i][1]
+        parents[node1] = n + i
+        parents[node2] = n + i
+
+    labels = []
+    root_labels = {}
+    for i in range(n):
+        root = find_root(parents, i)
+        if root not in root_labels:
+            root_labels[root] = len(root_labels)
+        labels.append(root_labels[root])
+
+    sizes = [0] * len(root_labels)
+    sums = [[0] * len(data[0]) for _ in range(len(root_labels))]
+    for i in range(n):
+        sizes[labels[i]] += 1
+        for j in range(len(data[i])):
+            sums[labels[i]][j] += data[i][j]
+    centers = [[value / sizes[label] for value in sums[label]]
+               for label in range(len(sizes))]
+    return [labels, centers, sizes]
 
 
 def main():
@@ -177,9 +300,14 @@ def main():
         clusters.append(row[0]-1)
         data_no_id.append(row[1:])
         centers.append(row[1:])
-    clusters, centers, sizes = agglomerative_clustering(data_no_id, clusters,
-                                                   centers)
+    clusters, centers, sizes, linkage_rows = agglomerative_clustering(
+        data_no_id, clusters, centers)
     print(sizes)
+    write_linkage('HW06_linkage.csv', linkage_rows)
+    for k in [5, 10, 50]:
+        labels, cut_centers, cut_sizes = cut_hierarchy(data_no_id,
+                                                       linkage_rows, k=k)
+        print("Cluster sizes at k = %d: %s" % (k, sorted(cut_sizes)))
     #Dendogram for central linkage
     Z = linkage(data_no_id, method='average')
     plt.figure(figsize=(25, 10))